@@ -1,15 +1,19 @@
+import asyncio
+import json
 import logging
 import time
-from typing import List, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from qdrant_client import QdrantClient
 
 from chat.feedback_store import feedback_store
 from config.settings import settings
-from retrieval import HybridRetriever, LocalReranker
+from retrieval import Hit, HybridRetriever, LocalReranker
 from utils.llm_client import LLMClient
 from chat.prompt_template import CHAT_SYSTEM_PROMPT_TEMPLATE
 
@@ -17,11 +21,21 @@ from chat.prompt_template import CHAT_SYSTEM_PROMPT_TEMPLATE
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Confluence RAG API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the LLM connection pool on shutdown
+    await llm_client.aclose()
+
+app = FastAPI(title="Confluence RAG API", lifespan=lifespan)
 
 # --- Initialization ---
 # 1. Database & Vector Store
-qdrant_client = QdrantClient(url=settings.qdrant_url)
+qdrant_client = QdrantClient(
+    url=settings.qdrant_url,
+    prefer_grpc=settings.qdrant_prefer_grpc,
+    grpc_port=settings.qdrant_grpc_port
+)
 
 # 2. Components
 retriever = HybridRetriever(
@@ -33,6 +47,14 @@ llm_client = LLMClient(base_url=settings.ollama_base_url)  # Reusing 'ollama_bas
 
 logger.info("✅ System Components Initialized")
 
+# Idle seconds before an SSE comment is sent so proxies don't drop a slow stream
+SSE_KEEPALIVE_SECONDS = 15.0
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+NO_DOCUMENTS_ANSWER = "I couldn't find any relevant documents."
+
 
 # --- Data Models ---
 class ChatMessage(BaseModel):
@@ -42,6 +64,8 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     question: str
     history: List[ChatMessage] = []
+    # When set, history is kept server-side and `history` is ignored
+    conversation_id: Optional[str] = None
 
 class FeedbackRequest(BaseModel):
     question: str
@@ -50,20 +74,96 @@ class FeedbackRequest(BaseModel):
     feedback: str  # positive/negative
     user_id: Optional[str] = None
     comment: Optional[str] = None
+    feedback_id: Optional[str] = None  # client-generated; makes batch resends idempotent
+
+
+# --- Conversation State ---
+# Server-side chat histories keyed by conversation_id (least recently used evicted first)
+MAX_CONVERSATIONS = 1000
+# Only the last K question/answer pairs are kept and put in the prompt
+MAX_HISTORY_TURNS = 8
+conversations: "OrderedDict[str, List[ChatMessage]]" = OrderedDict()
+
+def get_history(request: ChatRequest) -> List[ChatMessage]:
+    """History for this turn: the stored conversation, or what the client sent."""
+    if request.conversation_id is None:
+        return request.history[-2 * MAX_HISTORY_TURNS:]
+    if request.conversation_id not in conversations:
+        # Lost on restart/reload or evicted: rebuild from the client's copy
+        if request.history:
+            logger.warning(f"Unknown conversation_id {request.conversation_id}, seeding from client history")
+        conversations[request.conversation_id] = request.history[-2 * MAX_HISTORY_TURNS:]
+    conversations.move_to_end(request.conversation_id)
+    return conversations[request.conversation_id]
+
+def record_turn(conversation_id: Optional[str], question: str, answer: str) -> None:
+    """Append a completed question/answer pair to a server-side conversation."""
+    if conversation_id is None:
+        return
+    history = conversations.setdefault(conversation_id, [])
+    history.append(ChatMessage(role="user", content=question))
+    history.append(ChatMessage(role="assistant", content=answer))
+    del history[:-2 * MAX_HISTORY_TURNS]
+    conversations.move_to_end(conversation_id)
+    while len(conversations) > MAX_CONVERSATIONS:
+        conversations.popitem(last=False)
 
 
 # --- Helper ---
 def format_chat_history(messages: List[ChatMessage]) -> str:
     return "\n".join([f"{m.role.title()}: {m.content}" for m in messages])
 
-def build_context(candidates: List[dict]) -> str:
+def build_context(candidates: List[Hit]) -> str:
     context = ""
     for c in candidates:
-        meta = c["payload"]
+        meta = c.payload
         context += f"Source: [{meta.get('title')}]({meta.get('url')})\n"
         context += f"{meta.get('chunk')}\n\n"
     return context
 
+def sse_event(payload: dict) -> str:
+    """Frame a payload as a single Server-Sent Event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def with_keepalive(events: AsyncIterator[str], interval: float) -> AsyncIterator[str]:
+    """Relay SSE frames, emitting a comment line whenever `events` is idle for `interval` seconds."""
+    events = events.__aiter__()
+    pending = asyncio.ensure_future(events.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                frame = pending.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+            pending = asyncio.ensure_future(events.__anext__())
+    finally:
+        pending.cancel()
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap SSE frames in a streaming response with keep-alives and no-buffering headers."""
+    return StreamingResponse(
+        with_keepalive(events, SSE_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+def retrieve_and_rerank(question: str) -> List[Hit]:
+    """Blocking retrieval pipeline: hybrid search, then FlashRank."""
+    # 1. Retrieval (Hybrid: Dense + Sparse)
+    # Get more candidates for reranking
+    hybrid_results = retriever.search(question, limit=20)
+    if not hybrid_results:
+        return []
+
+    # 2. Reranking (FlashRank)
+    # Rerank top 20 -> top 5
+    return reranker.rerank(question, hybrid_results, top_n=settings.top_k)
+
 
 # --- Endpoints ---
 
@@ -76,22 +176,27 @@ def health_check():
 async def chat_endpoint(request: ChatRequest):
     start_time = time.time()
     logger.info(f"Received question: {request.question}")
+    # Resolve history up front so even a no-documents turn keeps the conversation
+    history = get_history(request)
 
-    # 1. Retrieval (Hybrid: Dense + Sparse)
-    # Get more candidates for reranking
-    hybrid_results = retriever.search(request.question, limit=20)
+    # 1-2. Retrieval + Reranking run on a worker thread (ONNX/Qdrant calls block)
+    # so the event loop keeps serving other streams meanwhile
+    reranked = await asyncio.to_thread(retrieve_and_rerank, request.question)
 
-    if not hybrid_results:
-        return JSONResponse(content={"answer": "I couldn't find any relevant documents.", "sources": []})
+    if not reranked:
+        # Same event sequence as a normal answer, so the client renders it like one
+        async def no_documents_generator():
+            yield sse_event({"type": "sources", "data": []})
+            yield sse_event({"type": "token", "data": NO_DOCUMENTS_ANSWER})
+            record_turn(request.conversation_id, request.question, NO_DOCUMENTS_ANSWER)
+            yield sse_event({"type": "end"})
 
-    # 2. Reranking (FlashRank)
-    # Rerank top 20 -> top 5
-    reranked = reranker.rerank(request.question, hybrid_results, top_n=settings.top_k)
+        return sse_response(no_documents_generator())
 
     # 3. Context Construction
     context_text = build_context(reranked)
     sources = [
-        {"title": r["payload"].get("title"), "url": r["payload"].get("url")}
+        {"title": r.payload.get("title"), "url": r.payload.get("url")}
         for r in reranked
     ]
     # Deduplicate sources
@@ -105,27 +210,28 @@ async def chat_endpoint(request: ChatRequest):
     # 4. Prompt Assembly
     full_prompt = CHAT_SYSTEM_PROMPT_TEMPLATE.format(
         formatted_context_with_sources=context_text,
-        formatted_chat_history=format_chat_history(request.history),
+        formatted_chat_history=format_chat_history(history),
         user_query=request.question
     )
 
-    # 5. Streaming Generation
+    # 5. Streaming Generation (Server-Sent Events)
     async def response_generator():
         # First yield sources
-        import json
-        yield json.dumps({"type": "sources", "data": unique_sources}) + "\n"
+        yield sse_event({"type": "sources", "data": unique_sources})
 
         full_answer = ""
         async for token in llm_client.generate_stream(full_prompt, model=settings.ollama_llm):
             if token:
                 full_answer += token
-                yield json.dumps({"type": "token", "data": token}) + "\n"
+                yield sse_event({"type": "token", "data": token})
 
-        yield json.dumps({"type": "end"}) + "\n"
+        # Record before "end": the client disconnects on it, which can cancel this generator
+        record_turn(request.conversation_id, request.question, full_answer)
+        yield sse_event({"type": "end"})
 
         logger.info(f"Chat processing took {time.time() - start_time:.2f}s")
 
-    return StreamingResponse(response_generator(), media_type="application/x-ndjson")
+    return sse_response(response_generator())
 
 
 @app.post("/feedback")
@@ -147,6 +253,28 @@ def feedback_endpoint(request: FeedbackRequest):
         raise HTTPException(status_code=500, detail="Failed to save feedback")
 
 
+@app.post("/feedback/batch")
+def feedback_batch_endpoint(batch: List[FeedbackRequest]):
+    """Store several feedback entries in one request (see FeedbackStore.save_feedback_batch)."""
+    try:
+        saved = feedback_store.save_feedback_batch([
+            {
+                "question": f.question,
+                "answer": f.answer,
+                "sources": f.sources,
+                "feedback_type": f.feedback,
+                "user_id": f.user_id,
+                "comment": f.comment,
+                "feedback_id": f.feedback_id,
+            }
+            for f in batch
+        ])
+        return {"status": "saved", "received": len(batch), "saved": saved}
+    except Exception as e:
+        logger.error(f"Failed to save feedback batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save feedback")
+
+
 @app.get("/feedback/stats")
 def feedback_stats():
     """Get aggregated feedback statistics."""
@@ -1,8 +1,9 @@
 import logging
 from datetime import datetime, timezone
 from typing import List, Optional
-from pymongo import MongoClient, DESCENDING
+from pymongo import MongoClient, DESCENDING, InsertOne, UpdateOne
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
 
 from config.settings import settings
 
@@ -31,9 +32,31 @@ class FeedbackStore:
             # Create indexes for common queries
             self._collection.create_index([("created_at", DESCENDING)])
             self._collection.create_index("feedback_type")
+            # Client-generated ids make resent batches idempotent (sparse: older docs lack one)
+            self._collection.create_index("feedback_id", unique=True, sparse=True)
             logger.info(f"✅ Connected to MongoDB feedback collection: {self.db_name}.{self.COLLECTION_NAME}")
         return self._collection
     
+    @staticmethod
+    def _build_doc(
+        question: str,
+        answer: str,
+        sources: List[dict],
+        feedback_type: str,
+        user_id: Optional[str] = None,
+        comment: Optional[str] = None
+    ) -> dict:
+        """Build a feedback document (shared by save_feedback and save_feedback_batch)."""
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": sources,
+            "feedback_type": feedback_type,
+            "user_id": user_id,
+            "comment": comment,
+            "created_at": datetime.now(timezone.utc),
+        }
+    
     def save_feedback(
         self,
         question: str,
@@ -57,20 +80,56 @@ class FeedbackStore:
         Returns:
             The inserted document's ID as a string
         """
-        doc = {
-            "question": question,
-            "answer": answer,
-            "sources": sources,
-            "feedback_type": feedback_type,
-            "user_id": user_id,
-            "comment": comment,
-            "created_at": datetime.now(timezone.utc),
-        }
+        doc = self._build_doc(question, answer, sources, feedback_type, user_id, comment)
         
         result = self.collection.insert_one(doc)
         logger.info(f"Feedback saved with ID: {result.inserted_id}")
         return str(result.inserted_id)
     
+    def save_feedback_batch(self, entries: List[dict]) -> int:
+        """
+        Save several feedback entries in one unordered bulk write.
+        
+        Entries carrying a `feedback_id` are upserted on it, so a batch that is
+        sent twice does not create duplicates.
+        
+        Args:
+            entries: Dicts with the save_feedback fields ('question', 'answer',
+                     'sources', 'feedback_type', 'user_id', 'comment') plus an
+                     optional 'feedback_id'
+            
+        Returns:
+            Number of new documents stored
+        """
+        ops = []
+        for entry in entries:
+            doc = self._build_doc(
+                entry["question"],
+                entry["answer"],
+                entry["sources"],
+                entry["feedback_type"],
+                entry.get("user_id"),
+                entry.get("comment"),
+            )
+            feedback_id = entry.get("feedback_id")
+            if feedback_id:
+                doc["feedback_id"] = feedback_id
+                ops.append(UpdateOne({"feedback_id": feedback_id}, {"$setOnInsert": doc}, upsert=True))
+            else:
+                ops.append(InsertOne(doc))
+        if not ops:
+            return 0
+        
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            saved = result.inserted_count + result.upserted_count
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                logger.error(f"❌ Feedback write failed (entry {err.get('index')}): {err.get('errmsg')}")
+            saved = e.details.get("nInserted", 0) + e.details.get("nUpserted", 0)
+        logger.info(f"Feedback batch saved: {saved}/{len(entries)} new entries")
+        return saved
+    
     def get_feedback_stats(self) -> dict:
         """Get aggregated feedback statistics."""
         pipeline = [
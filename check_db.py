@@ -6,7 +6,11 @@ QDRANT_URL_HOST = settings.qdrant_url
 COLLECTION_NAME = settings.qdrant_collection
 
 try:
-    client = QdrantClient(url=QDRANT_URL_HOST)
+    client = QdrantClient(
+        url=QDRANT_URL_HOST,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port
+    )
 
     print(f"Connecting to Qdrant at {QDRANT_URL_HOST}...")
 
@@ -20,6 +20,8 @@ class Settings(BaseSettings):
         default="http://qdrant:6333", env=["QDRANT_URL_HOST", "QDRANT_URL"]
     )
     qdrant_collection: str = Field(default="confluence_vectors_fastembed", alias="QDRANT_COLLECTION")
+    qdrant_prefer_grpc: bool = Field(default=True, alias="QDRANT_PREFER_GRPC")
+    qdrant_grpc_port: int = Field(default=6334, alias="QDRANT_GRPC_PORT")
 
     # LLM & Embeddings (New Schema)
     ollama_base_url: str = Field(default="http://localhost:1234/v1", alias="LLM_BASE_URL")
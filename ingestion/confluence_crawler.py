@@ -2,7 +2,8 @@ import os, re, time, html, logging
 from datetime import datetime
 from collections import deque
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 import requests
 
 from config.settings import settings
@@ -12,6 +13,7 @@ SPACE = settings.space_key
 PAT = settings.pat
 MONGO_URI = settings.mongo_uri
 MONGO_DB = settings.mongo_db
+WRITE_BATCH_SIZE = 50  # pages buffered per Mongo bulk_write
 
 if not BASE or not SPACE or not PAT:
     raise RuntimeError("BASE_URL, SPACE_KEY, and PAT must be configured in the environment or .env file.")
@@ -144,11 +146,31 @@ def extract_links(html_str):
     return out
 
 
+PAGE_ID_PARAM_PATTERN = re.compile(r"pageId=(\d+)")
+PAGE_ID_PATH_PATTERN = re.compile(r"/pages/(\d+)")
+
+
 def url_to_id(url):
-    m = re.search(r"pageId=(\d+)", url) or re.search(r"/pages/(\d+)", url)
+    m = PAGE_ID_PARAM_PATTERN.search(url) or PAGE_ID_PATH_PATTERN.search(url)
     return m.group(1) if m else None
 
 
+# ---------- Mongo writes ----------
+
+def flush_page_writes(ops):
+    """Upsert buffered pages in one unordered bulk_write; log and continue on errors."""
+    if not ops:
+        return
+    try:
+        col.bulk_write(ops, ordered=False)
+        logging.info(f"✅ Synced {len(ops)} pages")
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            logging.error(f"❌ Mongo write failed (op {err.get('index')}): {err.get('errmsg')}")
+        logging.info(f"✅ Synced {len(ops) - len(e.details.get('writeErrors', []))} of {len(ops)} pages")
+    ops.clear()
+
+
 # ---------- Core Crawl ----------
 
 def get_homepage_id():
@@ -180,6 +202,7 @@ def crawl(max_pages: int = 2000):
     queue = deque([home_id])
     seen = set()
     page_counter = 0
+    pending_writes = []
 
     logging.info(f"🌐 Starting crawl from homepage {home_id} in space {SPACE}")
 
@@ -189,60 +212,73 @@ def crawl(max_pages: int = 2000):
     #         continue
     #     seen.add(pid)
 
-    while queue and page_counter < max_pages:
-        pid = queue.popleft()
-        if pid in seen:
-            continue
-        seen.add(pid)
-        page_counter += 1
+    try:
+        while queue and page_counter < max_pages:
+            pid = queue.popleft()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            page_counter += 1
 
-        page_url = f"{BASE}/rest/api/content/{pid}?expand=body.storage,version"
-        r = safe_request(page_url)
-        if not r or not r.ok:
-            continue
-
-        j = r.json()
-        title = j.get("title", f"Untitled-{pid}")
-        body_html = j.get("body", {}).get("storage", {}).get("value", "")
-        version = j.get("version", {}).get("number", 1)
-        last_updated = j.get("version", {}).get("when")
-
-        # NEW: table-aware blocks + clean text
-        content_blocks = extract_content_with_tables_fast(body_html)
-        content_text = blocks_to_plaintext_for_embedding(content_blocks)
-
-        page_doc = {
-            "page_id": pid,
-            "space_key": SPACE,
-            "title": title,
-            "status": "current",
-            "url": f"{BASE}/spaces/{SPACE}/pages/{pid}/{title.replace(' ', '+')}",
-            "last_updated": last_updated,
-            "version": version,
-            "content_html": body_html,
-            "content_blocks": content_blocks,  # <— structured (tables preserved)
-            "content_text": content_text,  # <— used for embeddings
-            "synced_at": datetime.utcnow().isoformat()
-        }
-
-        col.update_one({"page_id": pid}, {"$set": page_doc}, upsert=True)
-        logging.info(f"✅ Synced: {title}")
-
-        # Enqueue children
+            page_url = f"{BASE}/rest/api/content/{pid}?expand=body.storage,version"
+            r = safe_request(page_url)
+            if not r or not r.ok:
+                continue
+
+            j = r.json()
+            title = j.get("title", f"Untitled-{pid}")
+            body_html = j.get("body", {}).get("storage", {}).get("value", "")
+            version = j.get("version", {}).get("number", 1)
+            last_updated = j.get("version", {}).get("when")
+
+            # NEW: table-aware blocks + clean text
+            content_blocks = extract_content_with_tables_fast(body_html)
+            content_text = blocks_to_plaintext_for_embedding(content_blocks)
+
+            page_doc = {
+                "page_id": pid,
+                "space_key": SPACE,
+                "title": title,
+                "status": "current",
+                "url": f"{BASE}/spaces/{SPACE}/pages/{pid}/{title.replace(' ', '+')}",
+                "last_updated": last_updated,
+                "version": version,
+                "content_html": body_html,
+                "content_blocks": content_blocks,  # <— structured (tables preserved)
+                "content_text": content_text,  # <— used for embeddings
+                "synced_at": datetime.utcnow().isoformat()
+            }
+
+            pending_writes.append(UpdateOne({"page_id": pid}, {"$set": page_doc}, upsert=True))
+            if len(pending_writes) >= WRITE_BATCH_SIZE:
+                flush_page_writes(pending_writes)
+            logging.info(f"📥 Fetched: {title}")
+
+            # Enqueue children
+            try:
+                for ch in get_children(pid):
+                    if ch["id"] not in seen:
+                        queue.append(ch["id"])
+            except Exception as e:
+                logging.warning(f"Child fetch failed for {pid}: {e}")
+
+            # Follow hyperlinks inside body
+            for l in extract_links(body_html):
+                cid = url_to_id(l)
+                if cid and cid not in seen:
+                    queue.append(cid)
+
+            time.sleep(0.1)
+    except BaseException:
+        # Save already-fetched pages on error/Ctrl-C, but never let a Mongo
+        # failure here mask the exception that stopped the crawl
         try:
-            for ch in get_children(pid):
-                if ch["id"] not in seen:
-                    queue.append(ch["id"])
-        except Exception as e:
-            logging.warning(f"Child fetch failed for {pid}: {e}")
-
-        # Follow hyperlinks inside body
-        for l in extract_links(body_html):
-            cid = url_to_id(l)
-            if cid and cid not in seen:
-                queue.append(cid)
-
-        time.sleep(0.1)
+            flush_page_writes(pending_writes)
+        except PyMongoError as e:
+            logging.error(f"❌ Could not flush {len(pending_writes)} buffered pages: {e}")
+        raise
+
+    flush_page_writes(pending_writes)
 
     logging.info(f"🧭 Crawl complete. {len(seen)} pages processed.")
     logging.info(f"🕒 Started: {start_time} | Finished: {datetime.utcnow()}")
@@ -18,6 +18,7 @@ from fastembed import TextEmbedding, SparseTextEmbedding
 
 from config.settings import settings
 from ingestion.text_cleaner import hierarchical_chunks
+from utils.vectors import normalize_vectors
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -44,6 +45,13 @@ def init_qdrant(qdrant: QdrantClient, collection_name: str):
                     distance=models.Distance.COSINE
                 )
             },
+            # INT8 copies kept in RAM for search; originals stay available for rescoring
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    always_ram=True
+                )
+            ),
             sparse_vectors_config={
                 "sparse": models.SparseVectorParams(
                     index=models.SparseIndexParams(
@@ -56,6 +64,16 @@ def init_qdrant(qdrant: QdrantClient, collection_name: str):
     else:
         logger.info(f"Collection {collection_name} exists.")
 
+    # Keyword index so filtering/scrolling by page is served from the index
+    payload_schema = qdrant.get_collection(collection_name).payload_schema or {}
+    if "page_id" not in payload_schema:
+        logger.info("Creating payload index on page_id...")
+        qdrant.create_payload_index(
+            collection_name=collection_name,
+            field_name="page_id",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
 def run():
     """
     Synchronous embedding pipeline using FastEmbed (CPU optimized).
@@ -63,7 +81,12 @@ def run():
     """
     # 1. Connect to DBs
     mongo = MongoClient(settings.mongo_uri)[settings.mongo_db]["pages"]
-    qdrant = QdrantClient(url=settings.qdrant_url)
+    # gRPC ships vectors as packed floats instead of JSON arrays
+    qdrant = QdrantClient(
+        url=settings.qdrant_url,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port
+    )
     COLLECTION_NAME = settings.qdrant_collection  # Should be 'confluence_vectors_fastembed'
 
     init_qdrant(qdrant, COLLECTION_NAME)
@@ -156,8 +179,8 @@ def run():
         logger.info(f"Processing batch {i}/{total_chunks}...")
 
         # Generate Dense Embeddings (Generator -> List)
-        # list(dense_model.embed(batch_texts)) returns list of numpy arrays
-        batch_dense = list(dense_model.embed(batch_texts))
+        # Stored unit-norm so retrieval can score with plain dot products
+        batch_dense = normalize_vectors(list(dense_model.embed(batch_texts)))
 
         # Generate Sparse Embeddings
         # list(sparse_model.embed(batch_texts)) returns list of SparseEmbedding objects
@@ -1,77 +1,201 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 import numpy as np
 
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from fastembed import TextEmbedding, SparseTextEmbedding
 from flashrank import Ranker, RerankRequest
 
 from config.settings import settings
+from utils.vectors import normalize_vectors
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; MMR falls back to the NumPy loop
+    njit = None
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(slots=True)
+class Hit:
+    """A single search/rerank result."""
+    id: str
+    payload: Dict[str, Any]
+    score: float
+    vector: Optional[Dict[str, Any]] = None  # named vectors, e.g. {"dense": [...]}
+
+
+def _mmr_select_numpy(sim: np.ndarray, rel: np.ndarray, k: int, lam: float) -> np.ndarray:
+    """Greedy MMR selection: indices of `k` picks given pairwise and query similarities."""
+    selected = np.empty(k, dtype=np.int64)
+    max_sim_to_selected = np.zeros(rel.shape[0], dtype=np.float32)
+    mmr_scores = np.empty(rel.shape[0], dtype=np.float32)
+    for i in range(k):
+        np.multiply(max_sim_to_selected, lam - 1, out=mmr_scores)
+        mmr_scores += lam * rel
+        mmr_scores[selected[:i]] = -np.inf
+        best = int(mmr_scores.argmax())
+        selected[i] = best
+        np.maximum(max_sim_to_selected, sim[best], out=max_sim_to_selected)
+    return selected
+
+
+def _mmr_select_loop(sim, rel, k, lam):
+    """Scalar form of _mmr_select_numpy for Numba (no infinities, fastmath-safe)."""
+    n = rel.shape[0]
+    max_sim = np.zeros(n, dtype=np.float32)
+    taken = np.zeros(n, dtype=np.bool_)
+    selected = np.empty(k, dtype=np.int64)
+    for i in range(k):
+        best = -1
+        best_score = 0.0
+        for j in range(n):
+            if taken[j]:
+                continue
+            score = lam * rel[j] - (1 - lam) * max_sim[j]
+            if best < 0 or score > best_score:
+                best = j
+                best_score = score
+        selected[i] = best
+        taken[best] = True
+        for j in range(n):
+            if sim[best, j] > max_sim[j]:
+                max_sim[j] = sim[best, j]
+    return selected
+
+
+_mmr_select = njit(cache=True, fastmath=True)(_mmr_select_loop) if njit else _mmr_select_numpy
+
+
 class HybridRetriever:
     """
     State-of-the-art Hybrid Retriever using Qdrant Native Sparse Vectors.
     No in-memory indices. Fully scalable.
+
+    Dense vectors are unit-norm everywhere: ingestion normalizes them (and the
+    COSINE collection stores them normalized), and query embeddings are
+    normalized once in embed_query. Similarities are therefore plain dot products.
     """
 
     def __init__(
         self, 
-        qdrant: QdrantClient, 
+        qdrant: Union[QdrantClient, AsyncQdrantClient], 
         collection_name: str,
         dense_model_name: str = "BAAI/bge-small-en-v1.5",
-        sparse_model_name: str = "prithivida/Splade_PP_en_v1"
+        sparse_model_name: str = "prithivida/Splade_PP_en_v1",
+        mmr_fetch_multiplier: float = 2.0,
+        mmr_diversity_floor: int = 10
     ):
         self.qdrant = qdrant
         self.collection_name = collection_name
+        # MMR candidate pool: max(limit * multiplier, limit + floor)
+        self.mmr_fetch_multiplier = mmr_fetch_multiplier
+        self.mmr_diversity_floor = mmr_diversity_floor
+        self._rrf = models.FusionQuery(fusion=models.Fusion.RRF)
         
-        # Load embedding models using configurable cache path
-        logger.info(f"Initializing HybridRetriever models from {settings.fastembed_cache_path}...")
+        # Load embedding models using configurable cache path.
+        # Both ONNX sessions run concurrently per query, so split the cores between them
+        threads = max(1, (os.cpu_count() or 2) // 2)
+        logger.info(f"Initializing HybridRetriever models from {settings.fastembed_cache_path} ({threads} threads each)...")
         self.dense_model = TextEmbedding(
             model_name=dense_model_name,
             cache_dir=settings.fastembed_cache_path,
+            threads=threads,
             local_files_only=True
         )
         self.sparse_model = SparseTextEmbedding(
             model_name=sparse_model_name,
             cache_dir=settings.fastembed_cache_path,
+            threads=threads,
             local_files_only=True
         )
         
-        # Query cache for repeated queries
-        self._cache: Dict[str, List[Dict[str, Any]]] = {}
-        self._cache_max_size = 100
-
-    def _get_cache_key(self, query: str, limit: int, use_mmr: bool) -> str:
-        """Generate cache key from query parameters."""
-        return hashlib.md5(f"{query}:{limit}:{use_mmr}".encode()).hexdigest()
-
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        return float(np.dot(vec1, vec2) / (norm1 * norm2))
+        # LRU cache of search results for repeated queries
+        self._search_cached = lru_cache(maxsize=100)(self._search_impl)
+
+        # Dense query embeddings are shared by search and the reranker cache
+        self.embed_query = lru_cache(maxsize=256)(self._embed_dense_query)
+        # Python-list form for Prefetch; pydantic converts ndarrays element by element
+        self._dense_query_list = lru_cache(maxsize=256)(lambda q: self.embed_query(q).tolist())
+        # Sparse side cached alongside, so repeat queries skip both models entirely
+        self._sparse_query = lru_cache(maxsize=256)(self._embed_sparse_query)
+
+        # ONNX Runtime releases the GIL, so dense and sparse query embeddings overlap
+        self._embed_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="query-embed")
+
+        # Reusable MMR working buffers, per thread since searches may run concurrently
+        self._mmr_local = threading.local()
+        self._mmr_capacity = 90  # covers default MMR pools with headroom; grows on demand
+
+        self._warmup()
+
+    def _warmup(self) -> None:
+        """Run both models once so ONNX Runtime initializes now, not on the first query."""
+        try:
+            next(iter(self.dense_model.embed(["warmup"])))
+            next(iter(self.sparse_model.embed(["warmup"])))
+        except Exception as e:
+            logger.warning(f"Embedding model warm-up failed: {e}")
+
+    def _embed_dense_query(self, query_text: str) -> np.ndarray:
+        """Embed and L2-normalize a query with the dense model (read-only, safe to share)."""
+        vec = normalize_vectors(next(iter(self.dense_model.embed([query_text]))))
+        vec.setflags(write=False)
+        return vec
+
+    def _embed_sparse_query(self, query_text: str) -> models.SparseVector:
+        """Embed a query with the sparse model, converted once to Qdrant's list form."""
+        sparse = next(iter(self.sparse_model.embed([query_text])))
+        return models.SparseVector(
+            indices=sparse.indices.astype(np.int32).tolist(),
+            values=sparse.values.tolist()
+        )
+
+    def cache_info(self):
+        """Hit/miss statistics of the search result cache."""
+        return self._search_cached.cache_info()
+
+    def cache_clear(self) -> None:
+        """Drop all cached search results."""
+        self._search_cached.cache_clear()
+
+    def _mmr_buffers(self, n: int, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return float32 views sized for n candidates: the (n + 1, dim) stacked
+        matrix (query in row 0, candidates below) and its (n + 1, n) similarities.
+        """
+        bufs = self._mmr_local
+        emb = getattr(bufs, "emb", None)
+        if emb is None or emb.shape[0] < n + 1 or emb.shape[1] != dim:
+            capacity = max(n, self._mmr_capacity)
+            bufs.emb = np.empty((capacity + 1, dim), dtype=np.float32)
+            bufs.sim = np.empty((capacity + 1) * capacity, dtype=np.float32)
+        # Slicing the flat buffer keeps the (n + 1, n) view contiguous for matmul/Numba
+        return bufs.emb[:n + 1], bufs.sim[:(n + 1) * n].reshape(n + 1, n)
 
     def _apply_mmr(
         self, 
         query_embedding: np.ndarray,
-        candidates: List[Dict[str, Any]], 
+        candidates: List[Hit], 
         limit: int,
         lambda_param: float = 0.7
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Hit]:
         """
         Apply Maximal Marginal Relevance for diverse results.
         
         Args:
             query_embedding: The query vector
-            candidates: List of search results with embeddings
+            candidates: List of search results carrying dense vectors
             limit: Number of results to return
             lambda_param: Balance between relevance (1.0) and diversity (0.0)
                          Default 0.7 = 70% relevance, 30% diversity
@@ -81,59 +205,34 @@ class HybridRetriever:
         """
         if len(candidates) <= limit:
             return candidates
-        
-        selected = []
-        remaining = candidates.copy()
-        
-        # Get embeddings for all candidates (we'll use dense for diversity calculation)
-        candidate_embeddings = []
-        for c in remaining:
-            # Generate embedding for each chunk
-            chunk_text = c["payload"].get("chunk", "")
-            if chunk_text:
-                emb = list(self.dense_model.embed([chunk_text]))[0]
-                candidate_embeddings.append(emb)
-            else:
-                candidate_embeddings.append(np.zeros(384))  # Default for empty
-        
-        while len(selected) < limit and remaining:
-            mmr_scores = []
-            
-            for i, (cand, cand_emb) in enumerate(zip(remaining, candidate_embeddings)):
-                # Relevance: similarity to query
-                relevance = self._cosine_similarity(query_embedding, cand_emb)
-                
-                # Diversity: max similarity to already selected items
-                max_sim_to_selected = 0.0
-                if selected:
-                    for sel_idx in [candidates.index(s) for s in selected if s in candidates]:
-                        sim = self._cosine_similarity(
-                            cand_emb, 
-                            candidate_embeddings[candidates.index(remaining[0]) if remaining else 0]
-                        )
-                        max_sim_to_selected = max(max_sim_to_selected, sim)
-                
-                # MMR score
-                mmr = lambda_param * relevance - (1 - lambda_param) * max_sim_to_selected
-                mmr_scores.append((i, mmr, cand))
-            
-            # Select highest MMR score
-            mmr_scores.sort(key=lambda x: x[1], reverse=True)
-            best_idx, _, best_cand = mmr_scores[0]
-            
-            selected.append(best_cand)
-            remaining.pop(best_idx)
-            candidate_embeddings.pop(best_idx)
-        
-        return selected
+
+        # Dense vectors come back with the hits (with_vectors=["dense"]).
+        # Stacking the query on top of the candidates gets relevance and pairwise
+        # similarity from one float32 GEMM: row 0 is relevance, rows 1.. the (n, n)
+        # matrix. Stored and query vectors are unit-norm, so dot product == cosine.
+        # (float16 is not an option: NumPy has no fp16 BLAS and is ~100x slower.)
+        n = len(candidates)
+        dim = len(candidates[0].vector["dense"])
+        stacked, all_sims = self._mmr_buffers(n, dim)
+        stacked[0] = query_embedding
+        stacked[1:] = [c.vector["dense"] for c in candidates]
+
+        np.matmul(stacked, stacked[1:].T, out=all_sims)
+        relevance_scores, sim_matrix = all_sims[0], all_sims[1:]
+
+        # Greedy selection: track each candidate's max similarity to the picks so far
+        selected_indices = _mmr_select(sim_matrix, relevance_scores, limit, lambda_param)
+
+        return [candidates[i] for i in selected_indices]
 
     def search(
         self, 
         query_text: str, 
         limit: int = 10, 
         use_mmr: bool = False,
-        use_cache: bool = True
-    ) -> List[Dict[str, Any]]:
+        use_cache: bool = True,
+        with_vectors: bool = False
+    ) -> List[Hit]:
         """
         Perform Hybrid Search (Dense + Sparse) on Qdrant.
         
@@ -142,30 +241,76 @@ class HybridRetriever:
             limit: Number of results to return
             use_mmr: If True, apply MMR for diverse results
             use_cache: If True, use query cache
+            with_vectors: If True, include each hit's dense vector under "vector"
             
         Returns:
             List of search results
         """
-        # Check cache
-        cache_key = self._get_cache_key(query_text, limit, use_mmr)
-        if use_cache and cache_key in self._cache:
-            logger.info(f"Cache hit for query: {query_text[:50]}...")
-            return self._cache[cache_key]
-        
-        # 1. Generate Query Embeddings
-        query_dense = list(self.dense_model.embed([query_text]))[0]
-        query_sparse_obj = list(self.sparse_model.embed([query_text]))[0]
-        
-        query_sparse = models.SparseVector(
-            indices=query_sparse_obj.indices.tolist(),
-            values=query_sparse_obj.values.tolist()
+        if isinstance(self.qdrant, AsyncQdrantClient):
+            raise TypeError("HybridRetriever was given an AsyncQdrantClient; use asearch()")
+        if use_cache:
+            return self._search_cached(query_text, limit, use_mmr, with_vectors)
+        return self._search_impl(query_text, limit, use_mmr, with_vectors)
+
+    async def asearch(
+        self,
+        query_text: str,
+        limit: int = 10,
+        use_mmr: bool = False,
+        use_cache: bool = True,
+        with_vectors: bool = False
+    ) -> List[Hit]:
+        """
+        Awaitable variant of search().
+
+        With an AsyncQdrantClient the Qdrant round trip is awaited natively
+        (embedding still runs on a worker thread; results are not cached).
+        With a sync QdrantClient the cached search() runs on a worker thread.
+        """
+        if not isinstance(self.qdrant, AsyncQdrantClient):
+            return await asyncio.to_thread(self.search, query_text, limit, use_mmr, use_cache, with_vectors)
+
+        query_dense, query_kwargs = await asyncio.to_thread(
+            self._build_query, query_text, limit, use_mmr, with_vectors
         )
+        response = await self.qdrant.query_points(**query_kwargs)
+        return self._format_results(response.points, query_dense, limit, use_mmr, with_vectors)
 
-        # 2. Execute Hybrid Query (Prefetch Dense + Sparse -> RRF Fusion)
-        fetch_limit = limit * 3 if use_mmr else limit * 2
+    def _search_impl(
+        self,
+        query_text: str,
+        limit: int,
+        use_mmr: bool,
+        with_vectors: bool
+    ) -> List[Hit]:
+        """Uncached hybrid search; see search()."""
+        query_dense, query_kwargs = self._build_query(query_text, limit, use_mmr, with_vectors)
+        results = self.qdrant.query_points(**query_kwargs).points
+        return self._format_results(results, query_dense, limit, use_mmr, with_vectors)
+
+    def _build_query(
+        self,
+        query_text: str,
+        limit: int,
+        use_mmr: bool,
+        with_vectors: bool
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Embed the query and build query_points kwargs (shared by sync and async paths)."""
+        # 1. Generate Query Embeddings (dense and sparse concurrently, both cached)
+        dense_future = self._embed_pool.submit(self._dense_query_list, query_text)
+        sparse_future = self._embed_pool.submit(self._sparse_query, query_text)
+        query_dense_list = dense_future.result()
+        query_sparse = sparse_future.result()
+        query_dense = self.embed_query(query_text)
+
+        # 2. Hybrid Query (Prefetch Dense + Sparse -> RRF Fusion)
+        if use_mmr:
+            fetch_limit = max(int(limit * self.mmr_fetch_multiplier), limit + self.mmr_diversity_floor)
+        else:
+            fetch_limit = limit * 2
         prefetch = [
             models.Prefetch(
-                query=query_dense.tolist(),
+                query=query_dense_list,
                 using="dense",
                 limit=fetch_limit, 
             ),
@@ -176,44 +321,126 @@ class HybridRetriever:
             ),
         ]
 
-        results = self.qdrant.query_points(
+        fetch_vectors = with_vectors or use_mmr
+        query_kwargs = dict(
             collection_name=self.collection_name,
             prefetch=prefetch,
-            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            query=self._rrf,
             limit=fetch_limit if use_mmr else limit,
-            with_payload=True
-        ).points
+            with_payload=True,
+            with_vectors=["dense"] if fetch_vectors else False
+        )
+        return query_dense, query_kwargs
 
+    def _format_results(
+        self,
+        results: List[models.ScoredPoint],
+        query_dense: np.ndarray,
+        limit: int,
+        use_mmr: bool,
+        with_vectors: bool
+    ) -> List[Hit]:
+        """Wrap Qdrant points as Hits and apply MMR if requested."""
         # 3. Format results
-        hits = []
-        for hit in results:
-            hits.append({
-                "id": str(hit.id),
-                "payload": hit.payload,
-                "score": hit.score
-            })
+        fetch_vectors = with_vectors or use_mmr
+        hits = [
+            Hit(str(h.id), h.payload, h.score, h.vector if fetch_vectors else None)
+            for h in results
+        ]
         
         # 4. Apply MMR if requested
         if use_mmr and len(hits) > limit:
             hits = self._apply_mmr(query_dense, hits, limit)
-        
-        # 5. Cache results
-        if use_cache:
-            if len(self._cache) >= self._cache_max_size:
-                # Remove oldest entry (simple FIFO)
-                oldest_key = next(iter(self._cache))
-                del self._cache[oldest_key]
-            self._cache[cache_key] = hits
-        
+
         return hits
 
 
+class SemanticRerankCache:
+    """
+    In-memory cache of rerank results for near-duplicate questions.
+
+    Entries are matched on cosine similarity of the question embedding AND an
+    exact match of the candidate id set, so a hit is only possible when the
+    retriever returned the same documents. Entries expire after `ttl_seconds`;
+    when full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, threshold: float = 0.9, ttl_seconds: float = 300.0, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (n, d) unit-norm rows
+        self._entries: List[Dict[str, Any]] = []     # parallel to _vectors rows
+
+    @staticmethod
+    def make_key(candidates: List[Hit], top_n: int) -> Tuple[frozenset, int]:
+        """Build the exact-match part of the key from candidate ids."""
+        return frozenset(c.id for c in candidates), top_n
+
+    @staticmethod
+    def _unit(vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, keep: List[int]) -> None:
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+    def _evict_expired(self, now: float) -> None:
+        if not self._entries:
+            return
+        keep = [i for i, e in enumerate(self._entries) if now - e["created"] <= self.ttl_seconds]
+        if len(keep) != len(self._entries):
+            self._drop(keep)
+
+    def get(self, query_embedding: np.ndarray, key: Tuple[frozenset, int]) -> Optional[List[Hit]]:
+        """Return cached results for a similar question over the same candidates."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            if not self._entries:
+                return None
+            sims = self._vectors @ self._unit(query_embedding)
+            for idx in np.argsort(-sims):
+                if sims[idx] < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry["key"] == key:
+                    entry["last_used"] = now
+                    return entry["results"]
+        return None
+
+    def put(self, query_embedding: np.ndarray, key: Tuple[frozenset, int], results: List[Hit]) -> None:
+        """Store rerank results for a question embedding."""
+        now = time.monotonic()
+        vec = self._unit(query_embedding)[None, :]
+        with self._lock:
+            self._evict_expired(now)
+            if len(self._entries) >= self.max_entries:
+                lru_idx = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+                self._drop([i for i in range(len(self._entries)) if i != lru_idx])
+            self._entries.append({"key": key, "results": results, "created": now, "last_used": now})
+            self._vectors = vec if self._vectors is None else np.vstack([self._vectors, vec])
+
+
 class LocalReranker:
     """
     High-speed local reranker using FlashRank (TinyBERT).
     Replaces slow LLM calls.
     """
-    def __init__(self, model_name: str = "ms-marco-TinyBERT-L-2-v2", cache_dir: str = None):
+    def __init__(
+        self,
+        model_name: str = "ms-marco-TinyBERT-L-2-v2",
+        cache_dir: str = None,
+        cache: Optional[SemanticRerankCache] = None,
+        prefilter_factor: Optional[int] = None
+    ):
+        # Opt-in: a near-duplicate hit can serve another question's ranking
+        # (e.g. "enable X" vs "disable X"), so no cache unless one is passed in
+        self.cache = cache
+        self.prefilter_factor = prefilter_factor
         try:
             # Use local cache to avoid downloading from HuggingFace
             model_cache = cache_dir or settings.fastembed_cache_path
@@ -224,37 +451,79 @@ class LocalReranker:
             logger.warning(f"FlashRank failed to load: {e}. Using pass-through reranking.")
             self.ranker = None
 
-    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_n: int = 5) -> List[Dict[str, Any]]:
+        if self.ranker is not None:
+            # First ONNX run is slow; pay it at startup rather than on the first question
+            try:
+                self.ranker.rerank(RerankRequest(query="warmup", passages=[{"id": "0", "text": "warmup"}]))
+            except Exception as e:
+                logger.warning(f"FlashRank warm-up failed: {e}")
+
+    def _prefilter(
+        self,
+        candidates: List[Hit],
+        query_embedding: np.ndarray,
+        keep: int
+    ) -> List[Hit]:
+        """Keep the `keep` candidates closest to the query by dense cosine, in original order."""
+        if len(candidates) <= keep or not all(c.vector for c in candidates):
+            return candidates
+
+        # Stored and query vectors are unit-norm (see HybridRetriever)
+        matrix = np.asarray([c.vector["dense"] for c in candidates], dtype=np.float32)
+        scores = matrix @ np.asarray(query_embedding, dtype=np.float32)
+
+        top = np.sort(np.argsort(-scores)[:keep])
+        return [candidates[i] for i in top]
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[Hit],
+        top_n: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Hit]:
         """
         Rerank Qdrant results using Cross-Encoder logic (if available).
+
+        If `query_embedding` is given and the reranker was built with a
+        `prefilter_factor`, candidates carrying dense vectors are pruned to
+        `top_n * prefilter_factor` by cosine similarity before the cross-encoder
+        runs. Off by default: dense-only pruning drops SPLADE keyword matches,
+        and FlashRank is cheap enough to score the whole pool. With a
+        SemanticRerankCache, results are also reused for near-duplicate
+        questions over the same candidate set.
         """
         if not candidates:
             return []
-        
+
         # If ranker is disabled, pass-through
         if self.ranker is None:
             return candidates[:top_n]
 
-        # Prepare for FlashRank
-        passages = []
-        for c in candidates:
-            text = c["payload"].get("chunk", "")
-            passages.append({
-                "id": c["id"],
-                "text": text,
-                "meta": c["payload"]
-            })
+        cache_key = None
+        if query_embedding is not None:
+            if self.cache is not None:
+                cache_key = self.cache.make_key(candidates, top_n)
+                cached = self.cache.get(query_embedding, cache_key)
+                if cached is not None:
+                    logger.info(f"Rerank cache hit for query: {query[:50]}...")
+                    return cached
+            if self.prefilter_factor:
+                candidates = self._prefilter(candidates, query_embedding, top_n * self.prefilter_factor)
+
+        # Prepare for FlashRank; empty chunks would only score ~0, so skip them
+        passages = [{"id": c.id, "text": text} for c in candidates if (text := c.payload.get("chunk"))]
+        if not passages:
+            return candidates[:top_n]
 
         rerank_request = RerankRequest(query=query, passages=passages)
         results = self.ranker.rerank(rerank_request)
 
         # Map back to our format
-        reranked = []
-        for r in results[:top_n]:
-            reranked.append({
-                "id": r["id"],
-                "payload": r["meta"],
-                "score": r["score"]
-            })
-        
+        by_id = {c.id: c for c in candidates}
+        reranked = [Hit(r["id"], by_id[r["id"]].payload, r["score"]) for r in results[:top_n]]
+
+        if cache_key is not None:
+            self.cache.put(query_embedding, cache_key, reranked)
+
         return reranked
@@ -1,15 +1,46 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
+import re
 import logging
+import queue
+import threading
+import time
+import uuid
 from datetime import datetime
+from html import escape as html_escape
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # orjson is optional; stdlib json also parses UTF-8 bytes
+    json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
 # API_URL uses the service name from docker-compose, or localhost for local dev
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+# (connect, read) timeouts in seconds: fail fast on connect, allow slow LLM reads
+HEALTH_TIMEOUT = (1.5, 3)
+CHAT_TIMEOUT = (3, 180)
+FEEDBACK_TIMEOUT = (2, 5)
+
+# Streamed answers re-render every RENDER_INTERVAL seconds or RENDER_MAX_PENDING tokens
+RENDER_INTERVAL = 0.05
+RENDER_MAX_PENDING = 16
+
+# Feedback clicks are queued and POSTed to /feedback/batch by a background thread
+FEEDBACK_FLUSH_INTERVAL = 0.5
+FEEDBACK_BATCH_SIZE = 20
+FEEDBACK_SEND_ATTEMPTS = 3
+
+# Recent turns sent with each question, used by the API if it has lost the conversation
+HISTORY_FALLBACK_TURNS = 8
+
 # --- Page Config ---
 st.set_page_config(
     page_title="Confluence AI Assistant", 
@@ -19,7 +50,7 @@ st.set_page_config(
 )
 
 # --- Custom CSS for dark/light theme compatibility ---
-st.markdown("""
+CSS_BLOCK = """
 <style>
     /* Main header styling - gradient works in both themes */
     .main-header {
@@ -110,7 +141,21 @@ st.markdown("""
         border-radius: 25px !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def minified_css():
+    """CSS_BLOCK without comments and indentation; computed once per process."""
+    css = re.sub(r"/\*.*?\*/", "", CSS_BLOCK, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    return re.sub(r":\s+", ":", css).strip()
+
+
+# Streamlit drops elements a rerun doesn't re-emit, so the CSS is sent every run;
+# minifying keeps that per-rerun payload small
+st.markdown(minified_css(), unsafe_allow_html=True)
 
 # --- Header ---
 st.markdown("""
@@ -121,20 +166,89 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so every call reuses a keep-alive connection to the API."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        # Connect failures are retried for any method (nothing was sent yet).
+        # Read/status retries are GET-only: a replayed /chat POST would rerun the
+        # whole pipeline, and /feedback/batch has its own retry loop.
+        max_retries=Retry(
+            total=2,
+            connect=2,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False  # hand the last response back so raise_for_status() reports it
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _feedback_sender(pending, session):
+    """Drain the feedback queue every FEEDBACK_FLUSH_INTERVAL and POST it as one batch."""
+    while True:
+        batch = [pending.get()]
+        time.sleep(FEEDBACK_FLUSH_INTERVAL)  # let further clicks join this batch
+        while len(batch) < FEEDBACK_BATCH_SIZE:
+            try:
+                batch.append(pending.get_nowait())
+            except queue.Empty:
+                break
+        
+        # Entries carry feedback_id, so resending after a failure is safe.
+        # Only connection errors and 5xx are retried; a 4xx will not succeed on resend.
+        for attempt in range(1, FEEDBACK_SEND_ATTEMPTS + 1):
+            try:
+                session.post(f"{API_URL}/feedback/batch", json=batch, timeout=FEEDBACK_TIMEOUT).raise_for_status()
+                break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.HTTPError as e:
+                if e.response.status_code < 500:
+                    logger.error(f"Feedback batch of {len(batch)} rejected, dropping it: {e}")
+                    break
+                error = e
+            except requests.RequestException as e:
+                logger.error(f"Feedback batch of {len(batch)} could not be sent, dropping it: {e}")
+                break
+            logger.warning(f"Feedback batch failed (attempt {attempt}/{FEEDBACK_SEND_ATTEMPTS}): {error}")
+            if attempt < FEEDBACK_SEND_ATTEMPTS:
+                time.sleep(attempt)
+        else:
+            logger.error(f"Feedback batch of {len(batch)} dropped after {FEEDBACK_SEND_ATTEMPTS} attempts")
+
+
+@st.cache_resource
+def get_feedback_queue():
+    """Process-wide feedback queue, with its background sender thread."""
+    pending = queue.Queue()
+    threading.Thread(
+        target=_feedback_sender, args=(pending, get_session()), name="feedback-sender", daemon=True
+    ).start()
+    return pending
+
+
 def send_feedback(feedback_data, feedback_type):
-    """Send feedback to the backend."""
-    feedback_data["feedback"] = feedback_type
-    feedback_data["timestamp"] = datetime.utcnow().isoformat()
-    try:
-        requests.post(f"{API_URL}/feedback", json=feedback_data, timeout=5)
-    except Exception as e:
-        st.error(f"Failed to send feedback: {e}")
+    """Queue feedback for the backend; returns without waiting on the network."""
+    get_feedback_queue().put({
+        **feedback_data,
+        "feedback": feedback_type,
+        "timestamp": datetime.utcnow().isoformat(),
+        "feedback_id": uuid.uuid4().hex,
+    })
 
 
+@st.cache_data(ttl=10, show_spinner=False)
 def check_api_health():
-    """Check if API is running."""
+    """Check if API is running (cached for 10s so reruns don't each hit /health)."""
     try:
-        resp = requests.get(f"{API_URL}/health", timeout=5)
+        resp = get_session().get(f"{API_URL}/health", timeout=HEALTH_TIMEOUT)
         return resp.status_code == 200
     except requests.RequestException as e:
         logger.warning(f"Health check failed: {e}")
@@ -150,6 +264,9 @@ if "query_count" not in st.session_state:
     st.session_state.query_count = 0
 if "feedback_given" not in st.session_state:
     st.session_state.feedback_given = False
+if "conversation_id" not in st.session_state:
+    # The API keeps the history for this id, so only the new question is sent
+    st.session_state.conversation_id = uuid.uuid4().hex
 
 # --- Sidebar ---
 with st.sidebar:
@@ -178,6 +295,7 @@ with st.sidebar:
         st.session_state.last_response = None
         st.session_state.query_count = 0
         st.session_state.feedback_given = False
+        st.session_state.conversation_id = uuid.uuid4().hex
         st.success("Chat cleared!")
         st.rerun()
     
@@ -185,13 +303,13 @@ with st.sidebar:
     if st.session_state.last_response and st.session_state.last_response.get("sources"):
         st.divider()
         st.subheader("📄 Sources")
-        for idx, src in enumerate(st.session_state.last_response["sources"], 1):
-            with st.container():
-                st.markdown(f"""
-                <div class="source-card">
-                    <strong>{idx}.</strong> <a href="{src['url']}" target="_blank">{src['title']}</a>
-                </div>
-                """, unsafe_allow_html=True)
+        # One element for all cards; titles/urls come from page content, so escape them
+        cards = "".join(
+            f'<div class="source-card"><strong>{idx}.</strong> '
+            f'<a href="{html_escape(str(src["url"]))}" target="_blank">{html_escape(str(src["title"]))}</a></div>'
+            for idx, src in enumerate(st.session_state.last_response["sources"], 1)
+        )
+        st.markdown(cards, unsafe_allow_html=True)
     
     # Feedback Section
     if st.session_state.last_response and not st.session_state.feedback_given:
@@ -237,7 +355,11 @@ if prompt := st.chat_input("💬 Ask about your Confluence docs...", key="chat_i
     # Prepare payload
     payload = {
         "question": prompt,
-        "history": st.session_state.messages[:-1]
+        "conversation_id": st.session_state.conversation_id,
+        "history": [
+            {"role": m["role"], "content": m["content"]}
+            for m in st.session_state.messages[-(2 * HISTORY_FALLBACK_TURNS + 1):-1]
+        ]
     }
     
     # Reset last response
@@ -247,37 +369,52 @@ if prompt := st.chat_input("💬 Ask about your Confluence docs...", key="chat_i
     # Stream response
     with st.chat_message("assistant", avatar="🤖"):
         message_placeholder = st.empty()
-        full_response = ""
+        parts = []  # token buffer; joined only when rendering
         
         # Show typing indicator
         with st.spinner("🔍 Searching Confluence & generating answer..."):
             try:
-                resp = requests.post(
+                resp = get_session().post(
                     f"{API_URL}/chat", 
                     json=payload, 
                     stream=True, 
-                    timeout=180
+                    timeout=CHAT_TIMEOUT
                 )
                 resp.raise_for_status()
+                last_render = time.monotonic()
+                pending = 0
                 
-                for line in resp.iter_lines():
-                    if line:
-                        line_str = line.decode('utf-8').strip()
-                        if line_str:
-                            try:
-                                data = json.loads(line_str)
-                                
-                                if data["type"] == "token":
-                                    full_response += data["data"]
-                                    message_placeholder.markdown(full_response + "▌")
-                                elif data["type"] == "sources":
-                                    sources = data["data"]
-                                elif data["type"] == "end":
-                                    break
-                            except json.JSONDecodeError:
-                                continue
+                # Chunked responses still yield per HTTP chunk; the larger read size
+                # just cuts the number of reads/splits for bursts of small events
+                for line in resp.iter_lines(chunk_size=8192):
+                    # SSE: only "data:" lines carry events; blanks and ": keep-alive" comments are skipped
+                    if not line.startswith(b"data:"):
+                        continue
+                    try:
+                        # Parse the raw UTF-8 bytes; no decode() per line
+                        data = json_loads(line[5:])
+                    except ValueError:  # JSONDecodeError (either parser) or invalid UTF-8
+                        continue
+                    
+                    msg_type = data["type"]
+                    if msg_type == "token":
+                        parts.append(data["data"])
+                        pending += 1
+                        # Batch UI updates; re-rendering per token stalls fast streams
+                        now = time.monotonic()
+                        if pending >= RENDER_MAX_PENDING or now - last_render >= RENDER_INTERVAL:
+                            # Collapse what's rendered so the next join only adds new tokens
+                            parts[:] = ["".join(parts)]
+                            message_placeholder.markdown(parts[0] + "▌")
+                            last_render = now
+                            pending = 0
+                    elif msg_type == "sources":
+                        sources = data["data"]
+                    elif msg_type == "end":
+                        break
                 
                 # Final response
+                full_response = "".join(parts)
                 message_placeholder.markdown(full_response)
                 
                 # Save response
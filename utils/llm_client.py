@@ -7,7 +7,9 @@ Decoupled from embedding logic (which is now local via FastEmbed).
 
 import logging
 from typing import AsyncGenerator, Optional
-from openai import AsyncOpenAI, APIConnectionError, APITimeoutError # type: ignore
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, DefaultAsyncHttpxClient # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +25,32 @@ class LLMClient:
             api_key: Logic often requires a key, even if dummy.
             timeout: Request timeout in seconds.
         """
+        self._base_url = base_url
+        self._api_key = api_key
+        self._timeout = timeout
+        self._connect()
+
+    def _connect(self) -> None:
+        """Create the httpx connection pool and the OpenAI client that uses it."""
+        self._http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        )
         self.client = AsyncOpenAI(
-            base_url=base_url,
-            api_key=api_key,
-            timeout=timeout
+            base_url=self._base_url,
+            api_key=self._api_key,
+            timeout=self._timeout,
+            http_client=self._http_client
         )
 
+    async def aclose(self) -> None:
+        """
+        Close pooled connections (call on app shutdown).
+
+        A fresh pool is created afterwards, so the client stays usable if the app starts again.
+        """
+        await self._http_client.aclose()
+        self._connect()
+
     async def generate_stream(self, prompt: str, model: str = "local-model") -> AsyncGenerator[str, None]:
         """
         Stream response tokens from the LLM.
@@ -40,8 +62,12 @@ class LLMClient:
                 stream=True
             )
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                # Some servers end with a usage-only chunk that has no choices
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
 
         except APIConnectionError:
             logger.error("Failed to connect to LM Studio. Is it running on port 1234?")
@@ -0,0 +1,15 @@
+"""
+Dense vector helpers shared by ingestion and retrieval.
+
+Kept dependency-light (NumPy only) so the embedding job does not import the
+retrieval stack just to normalize vectors.
+"""
+
+import numpy as np
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector, or each row of a matrix, as float32."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return arr / np.maximum(norms, 1e-10)